@@ -2,26 +2,32 @@
 Structured Logging for FastAPI/Python Services
 
 Installation:
-pip install python-json-logger
+pip install orjson
 
 Features:
-- JSON structured logs for production
+- JSON structured logs for production (orjson-serialized)
 - Automatic trace ID generation
 - Log levels: DEBUG, INFO, WARNING, ERROR, CRITICAL
 - Integration with Loki via Promtail
 - FastAPI request logging middleware
 """
 
+import asyncio
+import atexit
+import io
 import logging
 import os
-import sys
+import threading
 import time
-import uuid
+from collections import deque
 from contextvars import ContextVar
-from functools import wraps
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache, singledispatch, wraps
 from typing import Any, Callable, Optional
+from urllib.parse import parse_qsl
 
-from pythonjsonlogger import jsonlogger
+import orjson
 
 # Context variable for trace ID
 trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
@@ -44,39 +50,256 @@ logger.setLevel(LOG_LEVEL)
 logger.handlers.clear()
 
 
-class CustomJsonFormatter(jsonlogger.JsonFormatter):
+# Standard LogRecord attributes; anything else on the record came in via
+# `extra=`. Frozenset so membership tests in the formatter hot loop take
+# CPython's fastest __contains__ path
+_RESERVED_ATTRS = frozenset({
+    "name", "msg", "args", "levelname", "levelno", "pathname", "filename",
+    "module", "exc_info", "exc_text", "stack_info", "lineno", "funcName",
+    "created", "msecs", "relativeCreated", "thread", "threadName",
+    "processName", "process", "message", "asctime", "taskName",
+    # Pre-rendered JSON fragment spliced literally by CustomJsonFormatter
+    "prefix_bytes",
+    # Stamped on the record at emit time and added explicitly by the formatter
+    "trace_id",
+})
+
+
+@singledispatch
+def _json_default(obj: Any) -> Any:
     """
-    Custom JSON formatter that adds service metadata
+    Fallback serializer for extra= values orjson cannot encode natively.
+    singledispatch caches the lookup per type, so repeated types resolve in
+    one step instead of a chain of isinstance checks. datetime, uuid.UUID
+    (emitted in dashed canonical form) and str-like types are handled
+    natively by orjson and never reach this hook.
     """
+    return str(obj)
+
+
+@_json_default.register
+def _(obj: Decimal) -> float:
+    return float(obj)
 
-    def add_fields(self, log_record: dict, record: logging.LogRecord, message_dict: dict):
-        super().add_fields(log_record, record, message_dict)
 
-        # Add timestamp
-        log_record["timestamp"] = self.formatTime(record, self.datefmt)
+try:
+    from pydantic import BaseModel
 
-        # Add service metadata
-        log_record["service"] = SERVICE_NAME
-        log_record["environment"] = ENVIRONMENT
-        log_record["version"] = APP_VERSION
+    @_json_default.register
+    def _(obj: BaseModel) -> dict:
+        return obj.model_dump()
+except ImportError:
+    pass
 
-        # Add trace ID from context
-        trace_id = trace_id_var.get()
+
+class CustomJsonFormatter(logging.Formatter):
+    """
+    orjson-backed JSON formatter that adds service metadata
+    """
+
+    def format(self, record: logging.LogRecord) -> bytes:
+        log_record = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc),
+            "service": SERVICE_NAME,
+            "environment": ENVIRONMENT,
+            "version": APP_VERSION,
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+
+        # Add trace ID: stamped on the record by RingQueueHandler since the
+        # listener thread cannot see the producer's contextvar, with the
+        # contextvar as fallback when formatting happens in-context
+        trace_id = getattr(record, "trace_id", None) or trace_id_var.get()
         if trace_id:
             log_record["trace_id"] = trace_id
 
-        # Add log level
-        log_record["level"] = record.levelname
+        # Merge fields passed via `extra=`
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                log_record[key] = value
+
+        if record.exc_info:
+            log_record["exc_info"] = self.formatException(record.exc_info)
+
+        payload = orjson.dumps(
+            log_record,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            default=_json_default,
+        )
+
+        # Splice in fields that were already orjson-encoded by the caller
+        # (an object body with the braces stripped), skipping re-encoding
+        prefix = record.__dict__.get("prefix_bytes")
+        if prefix:
+            payload = b"{" + prefix + b"," + payload[1:]
+
+        return payload
+
+
+class BytesStreamHandler(logging.Handler):
+    """
+    Handler that writes formatted records to the stdout file descriptor as
+    raw bytes, keeping orjson's native bytes output intact and skipping the
+    text-mode utf-8 round-trip done by logging.StreamHandler.
+
+    Writes go through a 64 KiB buffer so log bursts coalesce into far fewer
+    write syscalls; a background thread flushes every 100 ms, and ERROR and
+    above flush immediately so crash-time output never sits in the buffer.
+    """
+
+    def __init__(self, buffer_size: int = 65536, flush_interval: float = 0.1):
+        super().__init__()
+        # Buffered I/O objects carry their own lock, so emit() and the
+        # flusher thread can touch the writer concurrently
+        self._writer = io.BufferedWriter(
+            io.FileIO(1, "wb", closefd=False), buffer_size=buffer_size
+        )
+        self._flush_interval = flush_interval
+        atexit.register(self.flush)
+        threading.Thread(
+            target=self._flush_loop, name="log-flusher", daemon=True
+        ).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self._flush_interval)
+            self.flush()
+
+    def flush(self):
+        try:
+            self._writer.flush()
+        except (OSError, ValueError):
+            pass
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            msg = self.format(record)
+            if not isinstance(msg, bytes):
+                msg = msg.encode()
+            self._writer.write(msg + b"\n")
+            if record.levelno >= logging.ERROR:
+                self._writer.flush()
+        except BlockingIOError:
+            # stdout is a pipe and its buffer is full; drop rather than block
+            pass
+        except Exception:
+            self.handleError(record)
+
+    def handle_batch(self, records: list):
+        """
+        Format a batch of records and hand them to the kernel in a single
+        buffered write instead of one write per line
+        """
+        chunks = []
+        flush_now = False
+        for record in records:
+            if record.levelno < self.level:
+                continue
+            # Format per record so one bad record (e.g. mismatched %-args)
+            # only loses itself, not the rest of the batch
+            try:
+                msg = self.format(record)
+            except Exception:
+                self.handleError(record)
+                continue
+            if not isinstance(msg, bytes):
+                msg = msg.encode()
+            chunks.append(msg)
+            chunks.append(b"\n")
+            if record.levelno >= logging.ERROR:
+                flush_now = True
+        if chunks:
+            try:
+                self._writer.write(b"".join(chunks))
+                if flush_now:
+                    self._writer.flush()
+            except BlockingIOError:
+                # stdout is a pipe and its buffer is full; drop rather
+                # than block
+                pass
+
 
-        # Add source location
-        log_record["logger"] = record.name
-        log_record["file"] = record.filename
-        log_record["line"] = record.lineno
-        log_record["function"] = record.funcName
+class RingQueueHandler(logging.Handler):
+    """
+    Bounded drop-on-full handler: records land in a fixed-size ring buffer
+    (O(1) append, oldest record discarded on overflow) and a background
+    thread formats and writes them via the target handler. Bounds memory
+    under log bursts and never stalls the producer.
+
+    Dropped records are counted in `dropped_total`; services can export it
+    as a gauge if they want visibility into overflow.
+    """
+
+    # Records handed to the target per batch; keeps latency low while still
+    # amortizing the per-write cost across many lines
+    BATCH_SIZE = 32
+
+    def __init__(self, target: logging.Handler, maxlen: int = 65536):
+        super().__init__()
+        self.target = target
+        self._handle_batch = getattr(target, "handle_batch", None)
+        self.maxlen = maxlen
+        self.buf: deque = deque(maxlen=maxlen)
+        self.dropped_total = 0
+        self.event = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._drain, name="log-ring-listener", daemon=True
+        )
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        # Capture the trace ID on the producer side; the drain thread runs
+        # in its own context and cannot read the request's contextvar
+        if not hasattr(record, "trace_id"):
+            trace_id = trace_id_var.get()
+            if trace_id:
+                record.trace_id = trace_id
+        if len(self.buf) == self.maxlen:
+            self.dropped_total += 1
+        self.buf.append(record)
+        self.event.set()
+
+    def _drain(self):
+        batch = []
+        while True:
+            self.event.wait()
+            self.event.clear()
+            while self.buf:
+                try:
+                    batch.append(self.buf.popleft())
+                except IndexError:
+                    break
+                if len(batch) >= self.BATCH_SIZE:
+                    self._dispatch(batch)
+                    batch.clear()
+            if batch:
+                self._dispatch(batch)
+                batch.clear()
+            if self._stopped and not self.buf:
+                return
+
+    def _dispatch(self, batch: list):
+        if self._handle_batch is not None:
+            self._handle_batch(batch)
+        else:
+            for record in batch:
+                self.target.handle(record)
+
+    def stop(self):
+        """Flush remaining records and stop the listener thread"""
+        self._stopped = True
+        self.event.set()
+        self._thread.join(timeout=5)
 
 
-# Create console handler
-console_handler = logging.StreamHandler(sys.stdout)
+# Create console handler (runs on the listener thread, not the request path)
+console_handler = BytesStreamHandler()
 
 # Use JSON formatter for production, simple formatter for development
 if ENVIRONMENT == "development":
@@ -85,13 +308,15 @@ if ENVIRONMENT == "development":
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 else:
-    formatter = CustomJsonFormatter(
-        "%(timestamp)s %(level)s %(service)s %(message)s",
-        datefmt="%Y-%m-%dT%H:%M:%S.%fZ",
-    )
+    formatter = CustomJsonFormatter()
 
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+
+# The request path only pays for a cheap enqueue; a background listener
+# thread runs the formatter and writes to stdout
+ring_handler = RingQueueHandler(console_handler)
+logger.addHandler(ring_handler)
+atexit.register(ring_handler.stop)
 
 # Prevent propagation to root logger
 logger.propagate = False
@@ -102,8 +327,8 @@ logger.propagate = False
 # ========================================
 
 def generate_trace_id() -> str:
-    """Generate a unique trace ID"""
-    return str(uuid.uuid4())
+    """Generate a unique 32-char hex trace ID"""
+    return os.urandom(16).hex()
 
 
 def set_trace_id(trace_id: str):
@@ -116,7 +341,59 @@ def get_trace_id() -> Optional[str]:
     return trace_id_var.get()
 
 
-def create_logger(name: str, **context) -> logging.LoggerAdapter:
+@lru_cache(maxsize=2048)
+def _endpoint_prefix(method: str, path: str) -> bytes:
+    """
+    Pre-encoded {"method": ..., "path": ...} fragment (braces stripped) for
+    splicing by CustomJsonFormatter. The set of (method, path) pairs is
+    bounded by the route table, so the cache hit-rate is high.
+    """
+    return orjson.dumps({"method": method, "path": path})[1:-1]
+
+
+class FastContextLogger:
+    """
+    Thin replacement for logging.LoggerAdapter. LoggerAdapter.process
+    re-merges the bound context on every call; this passes the bound dict
+    by reference on the common no-extra call and only copies when the
+    caller supplies additional fields.
+    """
+
+    __slots__ = ("_logger", "_ctx")
+
+    def __init__(self, base: logging.Logger, context: dict):
+        self._logger = base
+        self._ctx = context
+
+    def _merged(self, extra: Optional[dict]) -> dict:
+        return self._ctx if extra is None else {**self._ctx, **extra}
+
+    def debug(self, msg, *args, extra=None, **kwargs):
+        self._logger.debug(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def info(self, msg, *args, extra=None, **kwargs):
+        self._logger.info(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def warning(self, msg, *args, extra=None, **kwargs):
+        self._logger.warning(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def error(self, msg, *args, extra=None, **kwargs):
+        self._logger.error(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def exception(self, msg, *args, extra=None, **kwargs):
+        self._logger.exception(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def critical(self, msg, *args, extra=None, **kwargs):
+        self._logger.critical(msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def log(self, level, msg, *args, extra=None, **kwargs):
+        self._logger.log(level, msg, *args, extra=self._merged(extra), stacklevel=2, **kwargs)
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+
+def create_logger(name: str, **context) -> FastContextLogger:
     """
     Create a logger with additional context
 
@@ -124,21 +401,47 @@ def create_logger(name: str, **context) -> logging.LoggerAdapter:
     request_logger = create_logger("api", user_id=user.id, request_id=req_id)
     request_logger.info("Processing request")
     """
-    return logging.LoggerAdapter(logger, context)
+    return FastContextLogger(logger, context)
 
 
 # ========================================
 # FastAPI Middleware
 # ========================================
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Source location reported for middleware request events; constant, so the
+# records can be built with makeRecord below instead of Logger.info/log,
+# whose findCaller walks stack frames on every call
+_MIDDLEWARE_FILE = __file__
+
+
+def _log_request_event(level: int, msg: str, extra: dict):
+    """Emit a request event without the per-call frame inspection"""
+    if logger.isEnabledFor(level):
+        logger.handle(
+            logger.makeRecord(
+                logger.name,
+                level,
+                _MIDDLEWARE_FILE,
+                0,
+                msg,
+                None,
+                None,
+                func="__call__",
+                extra=extra,
+            )
+        )
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware:
     """
-    FastAPI middleware to add request logging
+    Pure ASGI middleware to add request logging.
+
+    Implemented at the ASGI level rather than on BaseHTTPMiddleware, which
+    spawns an anyio task group per request for the call_next dance; this
+    keeps trace-ID propagation and both log calls on the request's own task.
 
     Usage:
     from fastapi import FastAPI
@@ -149,57 +452,93 @@ class LoggingMiddleware(BaseHTTPMiddleware):
     """
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
 
-    async def dispatch(self, request: Request, call_next):
-        # Generate or extract trace ID
-        trace_id = request.headers.get("x-trace-id") or generate_trace_id()
-        set_trace_id(trace_id)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        start_time = time.time()
-
-        # Log incoming request
-        logger.info(
+        # Generate or extract trace ID
+        trace_id = None
+        user_agent = None
+        for name, value in scope["headers"]:
+            if name == b"x-trace-id":
+                trace_id = value.decode("latin-1")
+            elif name == b"user-agent":
+                user_agent = value.decode("latin-1")
+        if not trace_id:
+            trace_id = generate_trace_id()
+        token = trace_id_var.set(trace_id)
+
+        start_time = time.perf_counter_ns()
+
+        method = scope["method"]
+        query_string = scope["query_string"]
+        client = scope.get("client")
+
+        # Log incoming request; method+path come from the LRU-cached
+        # pre-encoded fragment (the route is not matched yet, so the raw
+        # path is the best we have here)
+        _log_request_event(
+            logging.INFO,
             "Incoming request",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": dict(request.query_params),
-                "client_ip": request.client.host if request.client else None,
-                "user_agent": request.headers.get("user-agent"),
-            },
-        )
-
-        # Process request
-        response = await call_next(request)
-
-        # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
-
-        # Determine log level based on status code
-        if response.status_code >= 500:
-            log_level = logging.ERROR
-        elif response.status_code >= 400:
-            log_level = logging.WARNING
-        else:
-            log_level = logging.INFO
-
-        # Log response
-        logger.log(
-            log_level,
-            "Request completed",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": round(duration_ms, 2),
+            {
+                "prefix_bytes": _endpoint_prefix(method, scope["path"]),
+                # Most requests carry no query string; skip the parse and
+                # dict allocation for those. keep_blank_values matches what
+                # Starlette's QueryParams logged before the ASGI rewrite
+                "query_params": dict(
+                    parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+                )
+                if query_string
+                else None,
+                "client_ip": client[0] if client else None,
+                "user_agent": user_agent,
             },
         )
 
-        # Add trace ID to response headers
-        response.headers["X-Trace-ID"] = trace_id
+        status_code = 500
+        trace_header = (b"x-trace-id", trace_id.encode("latin-1"))
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add trace ID to response headers
+                message.setdefault("headers", []).append(trace_header)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Calculate duration
+            duration_ms = (time.perf_counter_ns() - start_time) * 1e-6
+
+            # Determine log level based on status code
+            if status_code >= 500:
+                log_level = logging.ERROR
+            elif status_code >= 400:
+                log_level = logging.WARNING
+            else:
+                log_level = logging.INFO
+
+            # Log the route template (e.g. /users/{user_id}) rather than
+            # the raw path to keep downstream Loki label cardinality bounded
+            # and the prefix cache small
+            _log_request_event(
+                log_level,
+                "Request completed",
+                {
+                    "prefix_bytes": _endpoint_prefix(
+                        method, getattr(scope.get("route"), "path", scope["path"])
+                    ),
+                    "status_code": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                },
+            )
 
-        return response
+            trace_id_var.reset(token)
 
 
 # ========================================
@@ -217,66 +556,97 @@ def log_execution(operation: str, **default_context):
     """
 
     def decorator(func: Callable):
+        # default_context and operation are decoration-time constants, so
+        # merge them once here instead of on every call
+        base_context = {**default_context, "operation": operation}
+
+        # Decide sync vs async once at decoration time so only the wrapper
+        # actually needed is constructed
+        if not asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+
+                # Gate so the extra dict is never built when DEBUG is off;
+                # %-style args defer message formatting to the formatter
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Starting %s",
+                        operation,
+                        extra=base_context,
+                    )
+
+                try:
+                    result = func(*args, **kwargs)
+                    duration_ms = (time.perf_counter_ns() - start) * 1e-6
+
+                    logger.info(
+                        "Completed %s",
+                        operation,
+                        extra={
+                            **base_context,
+                            "duration_ms": round(duration_ms, 2),
+                            "status": "success",
+                        },
+                    )
+
+                    return result
+
+                except Exception as e:
+                    duration_ms = (time.perf_counter_ns() - start) * 1e-6
+
+                    logger.error(
+                        "Failed %s",
+                        operation,
+                        extra={
+                            **base_context,
+                            "duration_ms": round(duration_ms, 2),
+                            "status": "error",
+                            "error": str(e),
+                            "error_type": type(e).__name__,
+                        },
+                        exc_info=True,
+                    )
+
+                    raise
+
+            return sync_wrapper
+
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start = time.time()
-            context = {**default_context, "operation": operation}
+            start = time.perf_counter_ns()
 
-            logger.debug(f"Starting {operation}", extra=context)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Starting %s",
+                    operation,
+                    extra=base_context,
+                )
 
             try:
                 result = await func(*args, **kwargs)
-                duration_ms = (time.time() - start) * 1000
+                duration_ms = (time.perf_counter_ns() - start) * 1e-6
 
                 logger.info(
-                    f"Completed {operation}",
-                    extra={**context, "duration_ms": round(duration_ms, 2), "status": "success"},
-                )
-
-                return result
-
-            except Exception as e:
-                duration_ms = (time.time() - start) * 1000
-
-                logger.error(
-                    f"Failed {operation}",
+                    "Completed %s",
+                    operation,
                     extra={
-                        **context,
+                        **base_context,
                         "duration_ms": round(duration_ms, 2),
-                        "status": "error",
-                        "error": str(e),
-                        "error_type": type(e).__name__,
+                        "status": "success",
                     },
-                    exc_info=True,
-                )
-
-                raise
-
-        @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            start = time.time()
-            context = {**default_context, "operation": operation}
-
-            logger.debug(f"Starting {operation}", extra=context)
-
-            try:
-                result = func(*args, **kwargs)
-                duration_ms = (time.time() - start) * 1000
-
-                logger.info(
-                    f"Completed {operation}",
-                    extra={**context, "duration_ms": round(duration_ms, 2), "status": "success"},
                 )
 
                 return result
 
             except Exception as e:
-                duration_ms = (time.time() - start) * 1000
+                duration_ms = (time.perf_counter_ns() - start) * 1e-6
 
                 logger.error(
-                    f"Failed {operation}",
+                    "Failed %s",
+                    operation,
                     extra={
-                        **context,
+                        **base_context,
                         "duration_ms": round(duration_ms, 2),
                         "status": "error",
                         "error": str(e),
@@ -287,12 +657,7 @@ def log_execution(operation: str, **default_context):
 
                 raise
 
-        import asyncio
-
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return async_wrapper
 
     return decorator
 
@@ -316,16 +681,18 @@ class Timer:
         self.start = None
 
     def __enter__(self):
-        self.start = time.time()
-        logger.debug(f"Starting {self.operation}", extra=self.context)
+        self.start = time.perf_counter_ns()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Starting %s", self.operation, extra=self.context)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration_ms = (time.time() - self.start) * 1000
+        duration_ms = (time.perf_counter_ns() - self.start) * 1e-6
 
         if exc_type is None:
             logger.info(
-                f"Completed {self.operation}",
+                "Completed %s",
+                self.operation,
                 extra={
                     **self.context,
                     "duration_ms": round(duration_ms, 2),
@@ -334,7 +701,8 @@ class Timer:
             )
         else:
             logger.error(
-                f"Failed {self.operation}",
+                "Failed %s",
+                self.operation,
                 extra={
                     **self.context,
                     "duration_ms": round(duration_ms, 2),
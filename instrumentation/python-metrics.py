@@ -10,6 +10,7 @@ Usage:
 3. Use middleware for automatic HTTP metrics collection
 """
 
+import asyncio
 import os
 import time
 from functools import wraps
@@ -25,6 +26,9 @@ from prometheus_client import (
     multiprocess,
     REGISTRY,
 )
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+from prometheus_client.registry import Collector
+from prometheus_client.utils import floatToGoString
 
 # Create registry
 registry = CollectorRegistry()
@@ -37,40 +41,8 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
 # Custom Metrics Definitions
 # ========================================
 
-# HTTP Request Counter
-http_requests_total = Counter(
-    "http_requests_total",
-    "Total number of HTTP requests",
-    ["method", "endpoint", "status_code", "service"],
-    registry=registry,
-)
-
-# HTTP Request Duration
-http_request_duration = Histogram(
-    "http_request_duration_seconds",
-    "Duration of HTTP requests in seconds",
-    ["method", "endpoint", "status_code", "service"],
-    buckets=[0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10],
-    registry=registry,
-)
-
-# HTTP Request Size
-http_request_size = Histogram(
-    "http_request_size_bytes",
-    "Size of HTTP requests in bytes",
-    ["method", "endpoint", "service"],
-    buckets=[100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000],
-    registry=registry,
-)
-
-# HTTP Response Size
-http_response_size = Histogram(
-    "http_response_size_bytes",
-    "Size of HTTP responses in bytes",
-    ["method", "endpoint", "status_code", "service"],
-    buckets=[100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000],
-    registry=registry,
-)
+# HTTP request count, duration and sizes are tracked by HTTPMetricsCollector
+# below (one dict update per request instead of four .labels() calls)
 
 # Active Requests
 active_requests = Gauge(
@@ -171,18 +143,158 @@ llm_tokens_used = Counter(
 )
 
 
+# ========================================
+# Combined HTTP Metrics Collector
+# ========================================
+
+_active_requests = active_requests.labels(service=SERVICE_NAME)
+
+
+class HTTPMetricsCollector(Collector):
+    """
+    Single collector for the per-request HTTP metrics (request count,
+    duration, request/response size). Recording a request is one dict
+    lookup plus in-place arithmetic per series instead of four separate
+    .labels() child updates; the Prometheus metric families are
+    materialized lazily at scrape time in collect().
+    """
+
+    DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10)
+    SIZE_BUCKETS = (100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+
+    def __init__(self, registry: CollectorRegistry = registry):
+        # (method, endpoint, status_code) -> [count, duration_sum, bucket_counts]
+        self._requests: dict = {}
+        # (method, endpoint) -> [count, size_sum, bucket_counts]
+        self._request_sizes: dict = {}
+        # (method, endpoint, status_code) -> [count, size_sum, bucket_counts]
+        self._response_sizes: dict = {}
+        registry.register(self)
+
+    def record(
+        self,
+        method: str,
+        endpoint: str,
+        status_code: int,
+        duration: float,
+        request_size: int,
+        response_size: int,
+    ):
+        """Record one completed HTTP request"""
+        key = (method, endpoint, str(status_code))
+
+        entry = self._requests.get(key)
+        if entry is None:
+            entry = self._requests.setdefault(
+                key, [0, 0.0, [0] * (len(self.DURATION_BUCKETS) + 1)]
+            )
+        entry[0] += 1
+        entry[1] += duration
+        entry[2][self._bucket_index(self.DURATION_BUCKETS, duration)] += 1
+
+        if request_size > 0:
+            self._observe_size(self._request_sizes, (method, endpoint), request_size)
+        if response_size > 0:
+            self._observe_size(self._response_sizes, key, response_size)
+
+    @staticmethod
+    def _bucket_index(bounds: tuple, value: float) -> int:
+        for i, le in enumerate(bounds):
+            if value <= le:
+                return i
+        return len(bounds)
+
+    def _observe_size(self, store: dict, key: tuple, size: int):
+        entry = store.get(key)
+        if entry is None:
+            entry = store.setdefault(
+                key, [0, 0.0, [0] * (len(self.SIZE_BUCKETS) + 1)]
+            )
+        entry[0] += 1
+        entry[1] += size
+        entry[2][self._bucket_index(self.SIZE_BUCKETS, size)] += 1
+
+    @staticmethod
+    def _cumulative_buckets(bounds: tuple, bucket_counts: list) -> list:
+        buckets = []
+        running = 0
+        for le, count in zip(bounds, bucket_counts):
+            running += count
+            # Format bounds exactly like a stock Histogram does, so the le
+            # label values (e.g. le="1e+06") stay identical across upgrades
+            buckets.append((floatToGoString(le), running))
+        buckets.append(("+Inf", running + bucket_counts[-1]))
+        return buckets
+
+    def collect(self):
+        labels = ["method", "endpoint", "status_code", "service"]
+
+        requests = CounterMetricFamily(
+            "http_requests_total",
+            "Total number of HTTP requests",
+            labels=labels,
+        )
+        duration = HistogramMetricFamily(
+            "http_request_duration_seconds",
+            "Duration of HTTP requests in seconds",
+            labels=labels,
+        )
+        for (method, endpoint, status), entry in list(self._requests.items()):
+            values = [method, endpoint, status, SERVICE_NAME]
+            requests.add_metric(values, entry[0])
+            duration.add_metric(
+                values,
+                self._cumulative_buckets(self.DURATION_BUCKETS, entry[2]),
+                entry[1],
+            )
+        yield requests
+        yield duration
+
+        request_size = HistogramMetricFamily(
+            "http_request_size_bytes",
+            "Size of HTTP requests in bytes",
+            labels=["method", "endpoint", "service"],
+        )
+        for (method, endpoint), entry in list(self._request_sizes.items()):
+            request_size.add_metric(
+                [method, endpoint, SERVICE_NAME],
+                self._cumulative_buckets(self.SIZE_BUCKETS, entry[2]),
+                entry[1],
+            )
+        yield request_size
+
+        response_size = HistogramMetricFamily(
+            "http_response_size_bytes",
+            "Size of HTTP responses in bytes",
+            labels=labels,
+        )
+        for (method, endpoint, status), entry in list(self._response_sizes.items()):
+            response_size.add_metric(
+                [method, endpoint, status, SERVICE_NAME],
+                self._cumulative_buckets(self.SIZE_BUCKETS, entry[2]),
+                entry[1],
+            )
+        yield response_size
+
+
+http_metrics = HTTPMetricsCollector()
+
+
 # ========================================
 # FastAPI Middleware
 # ========================================
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class MetricsMiddleware(BaseHTTPMiddleware):
+class MetricsMiddleware:
     """
-    FastAPI middleware to automatically track HTTP metrics
+    Pure ASGI middleware to automatically track HTTP metrics.
+
+    Implemented at the ASGI level rather than on BaseHTTPMiddleware, which
+    spawns a task group per request; status and response size are read off
+    the response messages directly, so streaming responses without a
+    content-length header are measured correctly.
 
     Usage:
     from fastapi import FastAPI
@@ -193,59 +305,62 @@ class MetricsMiddleware(BaseHTTPMiddleware):
     """
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-
-        # Increment active requests
-        active_requests.labels(service=SERVICE_NAME).inc()
-
-        # Track request size
-        request_size = int(request.headers.get("content-length", 0))
-        if request_size > 0:
-            http_request_size.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                service=SERVICE_NAME,
-            ).observe(request_size)
-
-        # Process request
-        response = await call_next(request)
-
-        # Calculate duration
-        duration = time.time() - start_time
-
-        # Get response size
-        response_size = int(response.headers.get("content-length", 0))
-
-        # Record metrics
-        http_requests_total.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=response.status_code,
-            service=SERVICE_NAME,
-        ).inc()
-
-        http_request_duration.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=response.status_code,
-            service=SERVICE_NAME,
-        ).observe(duration)
+        self.app = app
 
-        if response_size > 0:
-            http_response_size.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status_code=response.status_code,
-                service=SERVICE_NAME,
-            ).observe(response_size)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        # Decrement active requests
-        active_requests.labels(service=SERVICE_NAME).dec()
+        start_time = time.perf_counter_ns()
 
-        return response
+        # Increment active requests
+        _active_requests.inc()
+
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body = message.get("body")
+                if body:
+                    response_size += len(body)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Calculate duration (histograms take float seconds)
+            duration = (time.perf_counter_ns() - start_time) * 1e-9
+
+            # Use the matched route template (e.g. /users/{user_id}) as the
+            # endpoint label; raw paths with IDs would blow up cardinality
+            endpoint = getattr(scope.get("route"), "path", scope["path"])
+
+            request_size = 0
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        request_size = int(value)
+                    except ValueError:
+                        pass
+                    break
+
+            # Record metrics
+            http_metrics.record(
+                scope["method"],
+                endpoint,
+                status_code,
+                duration,
+                request_size,
+                response_size,
+            )
+
+            # Decrement active requests
+            _active_requests.dec()
 
 
 # ========================================
@@ -284,32 +399,32 @@ def track_time(metric: Histogram, labels: dict):
     """
 
     def decorator(func: Callable):
+        # Decide sync vs async once at decoration time so only the wrapper
+        # actually needed is constructed
+        if not asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    result = func(*args, **kwargs)
+                    return result
+                finally:
+                    duration = (time.perf_counter_ns() - start) * 1e-9
+                    metric.labels(**labels).observe(duration)
+
+            return sync_wrapper
+
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start = time.time()
+            start = time.perf_counter_ns()
             try:
                 result = await func(*args, **kwargs)
                 return result
             finally:
-                duration = time.time() - start
+                duration = (time.perf_counter_ns() - start) * 1e-9
                 metric.labels(**labels).observe(duration)
 
-        @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            start = time.time()
-            try:
-                result = func(*args, **kwargs)
-                return result
-            finally:
-                duration = time.time() - start
-                metric.labels(**labels).observe(duration)
-
-        import asyncio
-
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return async_wrapper
 
     return decorator
 
@@ -329,11 +444,11 @@ class Timer:
         self.start = None
 
     def __enter__(self):
-        self.start = time.time()
+        self.start = time.perf_counter_ns()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration = time.time() - self.start
+        duration = (time.perf_counter_ns() - self.start) * 1e-9
         self.metric.labels(**self.labels).observe(duration)
 
 